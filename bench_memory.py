@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Queue memory benchmark.
+Builds a large queue of realistic tracks and reports the bytes each queued
+track costs with the old __dict__ Song and with the compact tracks.Song.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from tracks import Song, stream_urls
+
+ARTISTS = 300
+REQUESTERS = 50
+
+class LegacySong:
+    """The Song shape before tracks.py: plain __dict__, Member and url inline"""
+
+    def __init__(self, title, artist, url, duration, thumbnail, source='YouTube', requester=None, track_id=None):
+        self.title = title
+        self.artist = artist
+        self.url = url
+        self.duration = duration
+        self.thumbnail = thumbnail
+        self.source = source
+        self.requester = requester
+        self.track_id = track_id
+
+class FakeMember:
+    """Stands in for discord.Member, shared between a user's requests like the real thing"""
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+
+def track_fields(i):
+    ## every string is built fresh, the way yt-dlp hands them over
+    video_id = f"{i:011d}"
+    expire = int(time.time()) + 6 * 60 * 60
+    stream_url = (
+        f"https://rr{i % 9}---sn-4g5e6nsz.googlevideo.com/videoplayback?expire={expire}"
+        f"&ei=Xq8cZ{video_id}&ip=203.0.113.7&id=o-A{video_id}&itag=251&source=youtube"
+        f"&requiressl=yes&mime=audio%2Fwebm&gir=yes&clen=3{i:09d}&dur=215.341"
+        "&lmt=1696000000000000&keepalive=yes&c=ANDROID&sparams=expire%2Cei%2Cip%2Cid%2Citag"
+        "%2Csource%2Crequiressl%2Cmime%2Cgir%2Cclen%2Cdur%2Clmt&sig=" + "AOq0QJ8wRQIh" * 20
+        + "&lsparams=met%2Cmh%2Cmm%2Cmn%2Cms%2Cmv%2Cmvi%2Cpl%2Cinitcwndbps&lsig=" + "AG3C_xAwRgIh" * 20
+    )
+    return dict(
+        title=f"Track number {i} (Official Audio)",
+        artist=''.join(["Artist ", str(i % ARTISTS)]),
+        url=stream_url,
+        duration=180 + i % 120,
+        thumbnail=f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        source=''.join(["You", "Tube"]),
+        track_id=f"https://www.youtube.com/watch?v={video_id}",
+    )
+
+def measure(build, count, expire=False):
+    """Bytes per track for a freshly built queue, optionally after its stream urls expired"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = build(count)
+    if expire:
+        stream_urls.entries.clear()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del queue
+    return (after - before) / count
+
+def build_legacy(count):
+    members = [FakeMember(user_id) for user_id in range(REQUESTERS)]
+    return [LegacySong(requester=members[i % REQUESTERS], **track_fields(i)) for i in range(count)]
+
+def build_compact(count):
+    return [Song(requester_id=100000 + i % REQUESTERS, **track_fields(i)) for i in range(count)]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"📦 Queue memory benchmark ({count:,} tracks)")
+
+    legacy = measure(build_legacy, count)
+    print(f"{'legacy Song':<34} {legacy:>8,.0f} bytes/track")
+
+    compact = measure(build_compact, count)
+    stream_urls.entries.clear()
+    print(f"{'compact Song + cached stream url':<34} {compact:>8,.0f} bytes/track  ({compact / legacy:.0%})")
+
+    ## what deep queue entries and history cost once their urls have expired
+    expired = measure(build_compact, count, expire=True)
+    print(f"{'compact Song, url expired':<34} {expired:>8,.0f} bytes/track  ({expired / legacy:.0%})")
+
+if __name__ == "__main__":
+    main()
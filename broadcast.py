@@ -0,0 +1,178 @@
+"""
+Broadcast mode: one ffmpeg Opus encode per unique track and start offset,
+fanned out to every guild playing it.
+
+A producer thread reads Opus frames into a ring buffer, paced to real time
+plus a small lead. Each guild gets a BroadcastSubscriber with its own read
+cursor, so CPU and bandwidth scale with unique streams instead of listeners.
+"""
+
+import asyncio
+import threading
+import time
+
+import discord
+
+FRAME_DURATION = 0.02
+OPUS_SILENCE = b'\xf8\xff\xfe'
+UNDERRUN_WAIT = 2 * FRAME_DURATION
+
+class BroadcastStream:
+    """Ring buffer of Opus frames filled by a single ffmpeg process"""
+
+    def __init__(self, key, source, capacity, lead, on_finish):
+        self.key = key
+        self.source = source
+        self.capacity = capacity
+        self.lead = lead
+        self.on_finish = on_finish
+        self.frames = [None] * capacity
+        self.head = 0  ## frames produced so far
+        self.finished = False
+        self.stopped = False
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+    def start(self):
+        threading.Thread(target=self.produce, name=f'broadcast-{self.key[0]}', daemon=True).start()
+
+    def produce(self):
+        started = time.perf_counter()
+        try:
+            while not self.stopped:
+                frame = self.source.read()
+                if not frame:
+                    break
+                with self.cond:
+                    self.frames[self.head % self.capacity] = frame
+                    self.head += 1
+                    self.cond.notify_all()
+
+                ## stay at most `lead` frames ahead of real time
+                ahead = self.head - (time.perf_counter() - started) / FRAME_DURATION
+                if ahead > self.lead:
+                    time.sleep((ahead - self.lead) * FRAME_DURATION)
+        finally:
+            with self.cond:
+                self.finished = True
+                self.cond.notify_all()
+            self.source.cleanup()
+            self.on_finish(self)
+
+    def subscribe(self, start):
+        """New subscriber from frame 0, or None once frame 0 has left the buffer"""
+        with self.cond:
+            if self.finished or self.stopped or self.head > self.capacity - self.lead:
+                return None
+            self.subscribers += 1
+            return BroadcastSubscriber(self, start)
+
+    def unsubscribe(self):
+        with self.cond:
+            self.subscribers -= 1
+            if self.subscribers <= 0:
+                self.stopped = True
+
+class BroadcastSubscriber(discord.AudioSource):
+    """One guild's view of a broadcast, with its own cursor into the ring"""
+
+    def __init__(self, stream, start):
+        self.stream = stream
+        self.start = start
+        self.cursor = 0
+        self.skipped = 0
+        self.ended = False
+        self.closed = False
+
+    @property
+    def position(self):
+        return self.start + self.cursor * FRAME_DURATION
+
+    def is_opus(self):
+        return True
+
+    def read(self):
+        stream = self.stream
+        with stream.cond:
+            ## a stalled guild that fell out of the ring rejoins near the head, at the
+            ## oldest frame it would have no margin and drop again on the next burst
+            oldest = max(0, stream.head - stream.capacity)
+            if self.cursor < oldest:
+                rejoin = max(oldest, stream.head - stream.lead)
+                self.skipped += rejoin - self.cursor
+                self.cursor = rejoin
+
+            if self.cursor >= stream.head and not stream.finished:
+                stream.cond.wait(UNDERRUN_WAIT)
+                if self.cursor >= stream.head and not stream.finished:
+                    return OPUS_SILENCE  ## keep the voice connection fed
+
+            if self.cursor >= stream.head:
+                self.ended = True
+                return b''
+
+            frame = stream.frames[self.cursor % stream.capacity]
+            self.cursor += 1
+            return frame
+
+    def cleanup(self):
+        ## also runs from __del__, only let go of the stream once
+        if not self.closed:
+            self.closed = True
+            self.stream.unsubscribe()
+
+class BroadcastHub:
+    """Finds or starts the shared stream for a track and start offset"""
+
+    def __init__(self, ffmpeg_slots, buffer_seconds, lead_seconds, bitrate, ffmpeg_wait):
+        self.loop = None
+        self.ffmpeg_slots = ffmpeg_slots
+        self.capacity = int(buffer_seconds / FRAME_DURATION)
+        self.lead = int(lead_seconds / FRAME_DURATION)
+        self.bitrate = bitrate
+        self.ffmpeg_wait = ffmpeg_wait
+        self.streams = {}
+        self.owners = {}
+
+    async def subscribe(self, song, start, ffmpeg_options, guild_id):
+        self.loop = asyncio.get_running_loop()
+        key = (song.track_id, int(start))
+        for stream in self.streams.get(key, []):
+            subscriber = stream.subscribe(start)
+            if subscriber:
+                return subscriber
+
+        ## nothing joinable, start a new encode; the slot belongs to the stream
+        await self.ffmpeg_slots.acquire(guild_id, timeout=self.ffmpeg_wait)
+        try:
+            source = discord.FFmpegOpusAudio(song.url, bitrate=self.bitrate, **ffmpeg_options)
+        except Exception:
+            self.ffmpeg_slots.release(guild_id)
+            raise
+
+        stream = BroadcastStream(key, source, self.capacity, self.lead, self.finished_soon)
+        self.streams.setdefault(key, []).append(stream)
+        self.owners[stream] = guild_id
+        subscriber = stream.subscribe(start)
+        stream.start()
+        return subscriber
+
+    def finished_soon(self, stream):
+        ## called from the producer thread
+        try:
+            self.loop.call_soon_threadsafe(self.finished, stream)
+        except RuntimeError:
+            pass  ## loop already closed
+
+    def finished(self, stream):
+        self.ffmpeg_slots.release(self.owners.pop(stream))
+        streams = self.streams.get(stream.key, [])
+        if stream in streams:
+            streams.remove(stream)
+        if not streams:
+            self.streams.pop(stream.key, None)
+
+    def describe(self):
+        streams = [stream for streams in self.streams.values() for stream in streams]
+        listeners = sum(stream.subscribers for stream in streams)
+        return f"{len(streams)} streams | {listeners} listeners"
@@ -6,19 +6,118 @@ import os
 from dotenv import load_dotenv
 import json
 import logging
-from collections import deque
+import logging.handlers
+import queue
+import atexit
+import signal
+import sys
+import traceback
+from collections import deque, Counter, OrderedDict
+import contextlib
 import random
 import yt_dlp
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import aiohttp
-import subprocess
+import re
+import sqlite3
+import threading
+import time
+from tracks import Song
+from broadcast import BroadcastHub, BroadcastSubscriber
+from prebuffer import StreamPrebuffer, PREBUFFER_PROTOCOLS
+try:
+    from audio_effects import EffectsChain, EffectSettings
+except ImportError:  ## numpy is optional, fall back to plain volume control
+    EffectsChain = EffectSettings = None
 load_dotenv()
 
 ## logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+## structured fields that call sites can pass through `extra`
+LOG_FIELDS = ('event', 'guild', 'command', 'latency_ms', 'song_source')
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any structured fields"""
+
+    def format(self, record):
+        event = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                event[field] = value
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in `sample` records of events logged with extra={'sample': N}"""
+
+    def __init__(self):
+        super().__init__()
+        self.counters = {}
+
+    def filter(self, record):
+        rate = getattr(record, 'sample', 1)
+        if rate <= 1:
+            return True
+        key = getattr(record, 'event', None) or record.msg
+        count = self.counters.get(key, 0)
+        self.counters[key] = count + 1
+        return count % rate == 0
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without formatting or blocking"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        ## formatting happens on the listener thread, not the event loop
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(config):
+    """Route all logging through a queue so the event loop never waits on I/O"""
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+    handlers = [console]
+
+    if config.LOG_FILE:
+        file_handler = logging.handlers.RotatingFileHandler(
+            config.LOG_FILE,
+            maxBytes=config.LOG_MAX_BYTES,
+            backupCount=config.LOG_BACKUPS,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    root.handlers = [queue_handler]
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 ## bot config
 class Config:
     def __init__(self):
@@ -26,9 +125,45 @@ class Config:
         self.SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
         self.SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
         self.COMMAND_PREFIX = '!'
+        ## loudness normalization
+        self.TARGET_LUFS = float(os.getenv('TARGET_LUFS', '-14'))
+        self.LOUDNESS_DB = os.getenv('LOUDNESS_DB', 'loudness.db')
+        self.ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '2'))
+        ## logging
+        self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+        self.LOG_FILE = os.getenv('LOG_FILE', 'musicbot.log')
+        self.LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+        self.LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', '5'))
+        self.LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+        self.LOG_SAMPLE_RATE = int(os.getenv('LOG_SAMPLE_RATE', '10'))
+        ## event loop watchdog and profiler
+        self.WATCHDOG_INTERVAL = float(os.getenv('WATCHDOG_INTERVAL', '0.1'))
+        self.STALL_THRESHOLD = float(os.getenv('STALL_THRESHOLD', '0.25'))
+        self.PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+        self.PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+        self.PROFILE_SECONDS = int(os.getenv('PROFILE_SECONDS', '30'))
+        ## admission control
+        self.MAX_EXTRACTIONS = int(os.getenv('MAX_EXTRACTIONS', '4'))
+        self.MAX_FFMPEG = int(os.getenv('MAX_FFMPEG', '32'))
+        self.MAX_WAITING = int(os.getenv('MAX_WAITING', '200'))
+        self.EXTRACTION_WAIT = float(os.getenv('EXTRACTION_WAIT', '20'))
+        self.FFMPEG_WAIT = float(os.getenv('FFMPEG_WAIT', '10'))
+        ## broadcast mode, one shared encode per track for all guilds
+        self.BROADCAST_MODE = os.getenv('BROADCAST_MODE', 'false').lower() == 'true'
+        self.BROADCAST_BUFFER = float(os.getenv('BROADCAST_BUFFER', '15'))
+        self.BROADCAST_LEAD = float(os.getenv('BROADCAST_LEAD', '1'))
+        self.AUDIO_BITRATE = int(os.getenv('AUDIO_BITRATE', '128'))
+        ## read-ahead prebuffer between the stream url and ffmpeg
+        self.PREBUFFER = os.getenv('PREBUFFER', 'true').lower() == 'true'
+        self.PREBUFFER_SECONDS = float(os.getenv('PREBUFFER_SECONDS', '10'))
+        self.PREBUFFER_MEMORY = int(os.getenv('PREBUFFER_MEMORY', str(4 * 1024 * 1024)))
+        self.PREBUFFER_CHUNK = int(os.getenv('PREBUFFER_CHUNK', str(256 * 1024)))
+        self.HTTP_CONNECTIONS = int(os.getenv('HTTP_CONNECTIONS', '64'))
 
-## spotify client setup
 config = Config()
+setup_logging(config)
+
+## spotify client setup
 spotify = spotipy.Spotify(client_credentials_manager=SpotifyClientCredentials(
     client_id=config.SPOTIFY_CLIENT_ID,
     client_secret=config.SPOTIFY_CLIENT_SECRET
@@ -59,18 +194,424 @@ ffmpeg_options = {
 
 ytdl = yt_dlp.YoutubeDL(ytdl_format_options)
 
-class Song:
-    def __init__(self, title, artist, url, duration, thumbnail, source='YouTube', requester=None):
-        self.title = title
-        self.artist = artist
-        self.url = url
-        self.duration = duration
-        self.thumbnail = thumbnail
-        self.source = source
-        self.requester = requester
+## admission control
+class SchedulerBusy(Exception):
+    """Raised when a scheduler sheds load instead of queueing more work"""
+
+    def __init__(self, name):
+        super().__init__(f"{name} scheduler is busy")
+        self.name = name
+
+BUSY_MESSAGE = "⏳ The bot is busy right now, please try again in a moment"
+
+class ExtractionError(Exception):
+    """Extraction failed for reasons other than the track itself (network, outage, yt-dlp breakage)"""
+
+EXTRACTION_FAILED_MESSAGE = "⚠️ Couldn't reach the music source, please try again in a moment"
+
+def is_unavailable(error):
+    """yt-dlp marks errors about the video itself (removed, private, blocked) as expected"""
+    if isinstance(error, yt_dlp.utils.DownloadError) and error.exc_info:
+        error = error.exc_info[1]
+    return isinstance(error, yt_dlp.utils.ExtractorError) and error.expected
+
+class FairScheduler:
+    """Caps concurrent work of one kind (extractions, ffmpeg processes).
+
+    Waiters are queued per guild and served round robin, with interactive
+    requests always ahead of bulk ones (playlist imports, background analysis).
+    When too many are already waiting, new requests are rejected with
+    SchedulerBusy instead of piling up.
+    """
+
+    def __init__(self, name, limit, max_waiting):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.active_by_guild = Counter()
+        self.waiting = {False: OrderedDict(), True: OrderedDict()}  ## keyed by bulk
+        self.waiting_count = 0
+        self.granted = 0
+        self.rejected = 0
+
+    async def acquire(self, guild_id, bulk=False, timeout=None):
+        if self.active < self.limit and not self.waiting_count:
+            self._grant(guild_id)
+            return
+
+        if self.waiting_count >= self.max_waiting:
+            self.rejected += 1
+            raise SchedulerBusy(self.name)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[bulk].setdefault(guild_id, deque()).append(future)
+        self.waiting_count += 1
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                self.release(guild_id)  ## granted just as we gave up
+            else:
+                self._discard(bulk, guild_id, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise SchedulerBusy(self.name) from None
+            raise
+
+    def release(self, guild_id):
+        self.active -= 1
+        self.active_by_guild[guild_id] -= 1
+        if self.active_by_guild[guild_id] <= 0:
+            del self.active_by_guild[guild_id]
+        self._wake()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, guild_id, bulk=False, timeout=None):
+        await self.acquire(guild_id, bulk, timeout)
+        try:
+            yield
+        finally:
+            self.release(guild_id)
+
+    def _grant(self, guild_id):
+        self.active += 1
+        self.active_by_guild[guild_id] += 1
+        self.granted += 1
+
+    def _wake(self):
+        while self.active < self.limit and self.waiting_count:
+            guilds = self.waiting[False] or self.waiting[True]
+            guild_id, waiters = next(iter(guilds.items()))
+            future = waiters.popleft()
+            self.waiting_count -= 1
+
+            ## round robin: the guild goes to the back of the line
+            del guilds[guild_id]
+            if waiters:
+                guilds[guild_id] = waiters
+
+            if not future.done():
+                self._grant(guild_id)
+                future.set_result(None)
+
+    def _discard(self, bulk, guild_id, future):
+        waiters = self.waiting[bulk].get(guild_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self.waiting_count -= 1
+            if not waiters:
+                del self.waiting[bulk][guild_id]
+
+    def describe(self):
+        interactive = sum(len(waiters) for waiters in self.waiting[False].values())
+        return (f"{self.active}/{self.limit} active | waiting: {interactive} interactive, "
+                f"{self.waiting_count - interactive} bulk | granted {self.granted}, rejected {self.rejected}")
+
+## loudness analysis
+EBUR128_INTEGRATED = re.compile(r'I:\s+(-?\d+(?:\.\d+)?) LUFS')
+EBUR128_TRUE_PEAK = re.compile(r'Peak:\s+(-?(?:\d+(?:\.\d+)?|inf)) dBFS')
+MIN_GAIN_DB = -12.0
+MAX_GAIN_DB = 6.0
+PEAK_CEILING_DB = -1.0  ## boosted tracks keep their true peak below this, s16 conversion would clip it
+
+async def measure_loudness(url, max_seconds=600):
+    """Measure integrated loudness (LUFS) and true peak (dBFS) of a stream with
+    ffmpeg's ebur128 filter. Returns (lufs, peak), or None if ffmpeg failed."""
+    command = [
+        'ffmpeg', '-hide_banner', '-nostats',
+        '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+        '-t', str(max_seconds), '-i', url,
+        ## per-frame readings go to the verbose level, only the summary is printed
+        '-vn', '-af', 'ebur128=peak=true:framelog=verbose', '-f', 'null', '-'
+    ]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+    except OSError:
+        return None
+
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), max_seconds * 2)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        if process.returncode is None:
+            ## timed out or cancelled on shutdown
+            process.kill()
+            await process.wait()
+
+    ## the summary printed at the end is the last match
+    output = stderr.decode('utf-8', errors='replace')
+    matches = EBUR128_INTEGRATED.findall(output)
+    peaks = EBUR128_TRUE_PEAK.findall(output)
+    if process.returncode != 0 or not matches or not peaks:
+        return None
+    return float(matches[-1]), float(peaks[-1])
+
+def gain_for_loudness(lufs, peak, target_lufs):
+    """Gain towards the target, but never pushing the true peak past the ceiling"""
+    gain_db = min(target_lufs - lufs, MAX_GAIN_DB, PEAK_CEILING_DB - peak)
+    return max(MIN_GAIN_DB, gain_db)
+
+class LoudnessStore:
+    """Persistent track -> gain table backed by SQLite"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS track_gain ('
+            'track_id TEXT PRIMARY KEY, lufs REAL NOT NULL, '
+            'gain_db REAL NOT NULL, analyzed_at REAL NOT NULL, peak REAL)'
+        )
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(track_gain)')]
+        if 'peak' not in columns:
+            self.db.execute('ALTER TABLE track_gain ADD COLUMN peak REAL')
+        self.db.commit()
+
+        ## whole table is kept in memory so lookups never hit the disk on the event loop;
+        ## boosts measured before peaks were recorded are left out so they get measured again
+        self.gains = dict(self.db.execute(
+            'SELECT track_id, gain_db FROM track_gain WHERE peak IS NOT NULL OR gain_db <= 0'
+        ))
+
+    def __contains__(self, track_id):
+        return track_id in self.gains
+
+    def get(self, track_id):
+        return self.gains.get(track_id)
+
+    def save(self, track_id, lufs, peak, gain_db):
+        """Blocking write, call it from an executor"""
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO track_gain (track_id, lufs, gain_db, analyzed_at, peak) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (track_id, lufs, gain_db, time.time(), peak)
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class LoudnessAnalyzer:
+    """Measures loudness of queued tracks with `workers` ffmpeg processes at most, once per track"""
+
+    def __init__(self, store, target_lufs, workers, ffmpeg_slots):
+        self.store = store
+        self.target_lufs = target_lufs
+        self.ffmpeg_slots = ffmpeg_slots
+        self.workers = workers
+        self.running = None  ## semaphore, made on first use so it belongs to the bot's loop
+        self.pending = {}
+        self.failed = set()
+
+    def schedule(self, song):
+        """Queue a background analysis unless the track is already known"""
+        track_id = song.track_id
+        if not track_id or not song.url:
+            return
+        if track_id in self.store or track_id in self.pending or track_id in self.failed:
+            return
+        if self.running is None:
+            self.running = asyncio.Semaphore(self.workers)
+        self.pending[track_id] = asyncio.ensure_future(self.analyze(track_id, song.url))
+
+    async def analyze(self, track_id, url):
+        loop = asyncio.get_running_loop()
+        try:
+            ## wait for a free worker before taking an ffmpeg slot, so queued analyses
+            ## never sit on slots playback needs; at most `workers` are held at once
+            async with self.running:
+                async with self.ffmpeg_slots.slot(None, bulk=True):
+                    measured = await measure_loudness(url)
+            if measured is None:
+                ## don't keep hammering a stream ffmpeg can't read
+                self.failed.add(track_id)
+                logger.warning("Loudness analysis failed for %s", track_id)
+                return
+
+            lufs, peak = measured
+            gain_db = gain_for_loudness(lufs, peak, self.target_lufs)
+            self.store.gains[track_id] = gain_db
+            await loop.run_in_executor(None, self.store.save, track_id, lufs, peak, gain_db)
+            logger.info("Analyzed %s: %.1f LUFS, peak %.1f dBFS, gain %+.1f dB", track_id, lufs, peak, gain_db,
+                        extra={'event': 'loudness'})
+        except SchedulerBusy:
+            pass  ## not failed, it'll be picked up the next time it's queued
+        except Exception as e:
+            logger.error("Error analyzing loudness: %s", e)
+        finally:
+            self.pending.pop(track_id, None)
+
+    def gain_for(self, song):
+        return self.store.get(song.track_id) if song.track_id else None
+
+    def shutdown(self):
+        for task in self.pending.values():
+            task.cancel()
+        self.store.close()
+
+## event loop diagnostics
+class LoopWatchdog:
+    """Measures event loop lag and logs the loop thread's stack when it stalls"""
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = time.monotonic()
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.loop_thread_id = None
+        self.task = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Call from the event loop thread"""
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.task = asyncio.ensure_future(self.heartbeat())
+        threading.Thread(target=self.monitor, name='loop-watchdog', daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.task:
+            self.task.cancel()
+
+    async def heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag = max(0.0, now - before - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.last_beat = now
+
+    def monitor(self):
+        ## runs in its own thread, so it can look at the loop while it's stuck
+        reported = None
+        while not self.stopped.wait(self.interval):
+            beat = self.last_beat
+            late = time.monotonic() - beat - self.interval
+            if late < self.threshold or reported == beat:
+                continue
+
+            reported = beat  ## one report per stall
+            self.stalls += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else 'unavailable\n'
+            logger.warning("Event loop stalled for %.0f ms, loop thread is at:\n%s", late * 1000, stack, extra={
+                'event': 'loop_stall',
+                'latency_ms': round(late * 1000),
+            })
+
+class SamplingProfiler:
+    """Time-boxed stack sampler that writes folded stacks for flamegraph tools"""
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def run(self, duration):
+        """Blocking, run it in a thread. Returns (path, samples), or None if already profiling"""
+        if not self.lock.acquire(blocking=False):
+            return None
+
+        try:
+            own_id = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = Counter()
+            samples = 0
+            deadline = time.monotonic() + duration
+
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    stacks[';'.join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(self.interval)
+
+            ## folded format: "root;...;leaf count", as read by flamegraph.pl and speedscope
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, time.strftime('profile-%Y%m%d-%H%M%S.folded'))
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            return path, samples
+        finally:
+            self.lock.release()
+
+## playback position
+FRAME_DURATION = 0.02  ## discord audio frames are 20 ms
+RESUME_TOLERANCE = 5  ## seconds before the end that count as finished
+MAX_RESUME_ATTEMPTS = 3
+BUSY_RETRY_DELAYS = (2, 5, 10, 20, 30)  ## seconds between retries of a track change shed for load or an outage
+MAX_SKIPPED_SONGS = 5  ## unplayable songs in a row before the queue stops
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def parse_timestamp(text):
+    """Parse '90', '1:30' or '1:02:30' into seconds, None if invalid"""
+    try:
+        parts = [int(part) for part in text.strip().split(':')]
+    except ValueError:
+        return None
+    if not 1 <= len(parts) <= 3 or any(part < 0 for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+class TrackedAudio(discord.AudioSource):
+    """Counts frames read from the decoder to know the playback position"""
+
+    def __init__(self, original, start=0, on_cleanup=None):
+        self.original = original
+        self.start = start
+        self.frames = 0
+        self.ended = False  ## decoder ran out, as opposed to being stopped
+        self.on_cleanup = on_cleanup
+
+    @property
+    def position(self):
+        return self.start + self.frames * FRAME_DURATION
+
+    def read(self):
+        data = self.original.read()
+        if data:
+            self.frames += 1
+        else:
+            self.ended = True
+        return data
 
-    def __str__(self):
-        return f"{self.title} by {self.artist} ({self.source})"
+    def is_opus(self):
+        return self.original.is_opus()
+
+    def cleanup(self):
+        self.original.cleanup()
+        ## cleanup also runs from __del__, make sure the callback fires once
+        callback, self.on_cleanup = self.on_cleanup, None
+        if callback:
+            callback()
 
 class MusicQueue:
     def __init__(self):
@@ -127,6 +668,29 @@ class MusicPlayer:
         self.voice_clients = {}
         self.queues = {}
         self.volumes = {}
+        self.effects = {}
+        self.trackers = {}
+        self.prebuffers = {}
+        self.http = None  ## pooled session for prebuffer range requests, opened in setup_hook
+        self.generations = {}
+        self.resume_attempts = {}
+        self.busy_retries = {}
+        self.text_channels = {}  ## last channel each guild used a command in, for notices
+        self.extractions = FairScheduler('extraction', config.MAX_EXTRACTIONS, config.MAX_WAITING)
+        self.ffmpeg = FairScheduler('ffmpeg', config.MAX_FFMPEG, config.MAX_WAITING)
+        self.broadcasts = BroadcastHub(
+            self.ffmpeg,
+            config.BROADCAST_BUFFER,
+            config.BROADCAST_LEAD,
+            config.AUDIO_BITRATE,
+            config.FFMPEG_WAIT
+        ) if config.BROADCAST_MODE else None
+        self.loudness = LoudnessAnalyzer(
+            LoudnessStore(config.LOUDNESS_DB),
+            config.TARGET_LUFS,
+            config.ANALYSIS_WORKERS,
+            self.ffmpeg
+        )
 
     def get_queue(self, guild_id):
         if guild_id not in self.queues:
@@ -136,48 +700,93 @@ class MusicPlayer:
     def get_voice_client(self, guild_id):
         return self.voice_clients.get(guild_id)
 
-    async def extract_info(self, query, search=True):
-        """Extract information from YouTube or Spotify"""
+    def get_effects(self, guild_id):
+        if guild_id not in self.effects:
+            self.effects[guild_id] = EffectSettings()
+        return self.effects[guild_id]
+
+    def apply_effects(self, guild_id):
+        """Push the guild's effect settings to the live source"""
+        voice_client = self.get_voice_client(guild_id)
+        if voice_client and isinstance(voice_client.source, EffectsChain):
+            voice_client.source.update(self.get_effects(guild_id))
+
+    def enqueue(self, guild_id, song):
+        """Add a song to the guild queue and start measuring its loudness"""
+        self.get_queue(guild_id).add(song)
+        self.loudness.schedule(song)
+
+    def build_ffmpeg_options(self, song, start=0, piped=False):
+        """ffmpeg options with the track's normalization gain in the filter chain"""
+        gain_db = self.loudness.gain_for(song)
+        audio_filter = f"volume={gain_db:.2f}dB" if gain_db is not None else "volume=0.8"
+        ## the prebuffer does its own retries, -reconnect only applies to http input
+        before_options = '' if piped else ffmpeg_options['before_options']
+        if start:
+            before_options += f" -ss {start:.2f}"
+        return {
+            'before_options': before_options.strip(),
+            'options': f'-vn -filter:a "{audio_filter}"'
+        }
+
+    async def extract_info(self, query, search=True, guild_id=None, bulk=False, raise_errors=False):
+        """Extract information from YouTube or Spotify, `raise_errors` re-raises instead of returning None"""
         try:
             loop = asyncio.get_event_loop()
 
             if 'spotify' in query:
-                return await self.extract_spotify_info(query)
+                return await self.extract_spotify_info(query, guild_id)
             else:
-                ## yt-dlp for youtube
-                data = await loop.run_in_executor(
-                    None, 
-                    lambda: ytdl.extract_info(
-                        f"ytsearch:{query}" if search and not query.startswith('http') else query,
-                        download=False
+                ## yt-dlp for youtube, bulk imports wait as long as they need to
+                timeout = None if bulk else config.EXTRACTION_WAIT
+                async with self.extractions.slot(guild_id, bulk, timeout):
+                    started = time.perf_counter()
+                    data = await loop.run_in_executor(
+                        None,
+                        lambda: ytdl.extract_info(
+                            f"ytsearch:{query}" if search and not query.startswith('http') else query,
+                            download=False
+                        )
                     )
-                )
 
                 if 'entries' in data:
                     data = data['entries'][0]
 
+                logger.info("Extracted %s", query, extra={
+                    'event': 'extract',
+                    'latency_ms': round((time.perf_counter() - started) * 1000),
+                    'song_source': 'YouTube',
+                    'sample': config.LOG_SAMPLE_RATE,
+                })
+
                 return Song(
                     title=data.get('title', 'Unknown Title'),
                     artist=data.get('uploader', 'Unknown Artist'),
                     url=data.get('url'),
                     duration=data.get('duration', 0),
                     thumbnail=data.get('thumbnail', ''),
-                    source='YouTube'
+                    source='YouTube',
+                    track_id=data.get('webpage_url') or data.get('id'),
+                    protocol=data.get('protocol')
                 )
+        except SchedulerBusy:
+            raise
         except Exception as e:
-            logger.error(f"Error extracting info: {e}")
+            if raise_errors:
+                raise
+            logger.error("Error extracting info: %s", e)
             return None
 
-    async def extract_spotify_info(self, spotify_url):
+    async def extract_spotify_info(self, spotify_url, guild_id=None):
         """Extract Spotify track info and find YouTube equivalent"""
         try:
             if 'track' in spotify_url:
                 track_id = spotify_url.split('/')[-1].split('?')[0]
-                track = spotify.track(track_id)
+                track = await asyncio.get_running_loop().run_in_executor(None, spotify.track, track_id)
 
                 query = f"{track['name']} {track['artists'][0]['name']}"
                 ## search for youtube version
-                youtube_song = await self.extract_info(query, search=True)
+                youtube_song = await self.extract_info(query, search=True, guild_id=guild_id)
 
                 if youtube_song:
                     youtube_song.title = track['name']
@@ -189,14 +798,20 @@ class MusicPlayer:
 
             elif 'playlist' in spotify_url:
                 playlist_id = spotify_url.split('/')[-1].split('?')[0]
-                playlist = spotify.playlist(playlist_id)
+                playlist = await asyncio.get_running_loop().run_in_executor(None, spotify.playlist, playlist_id)
 
                 songs = []
                 for item in playlist['tracks']['items'][:50]:  ## only first 50 songs
                     track = item['track']
                     if track:
                         query = f"{track['name']} {track['artists'][0]['name']}"
-                        youtube_song = await self.extract_info(query, search=True)
+                        try:
+                            youtube_song = await self.extract_info(query, search=True, guild_id=guild_id, bulk=True)
+                        except SchedulerBusy:
+                            ## keep what we have rather than dropping the whole import
+                            if songs:
+                                break
+                            raise
                         if youtube_song:
                             youtube_song.title = track['name']
                             youtube_song.artist = ', '.join([artist['name'] for artist in track['artists']])
@@ -205,43 +820,324 @@ class MusicPlayer:
 
                 return songs
 
+        except SchedulerBusy:
+            raise
         except Exception as e:
-            logger.error(f"Error extracting Spotify info: {e}")
+            logger.error("Error extracting Spotify info: %s", e)
             return None
 
     async def play_next(self, guild_id):
-        """Play the next song in queue"""
+        """Play the next song in queue, skipping ones that can't be played.
+
+        SchedulerBusy and ExtractionError are raised with the song that hit them
+        left as the queue's current song, so it can be retried.
+        """
         voice_client = self.get_voice_client(guild_id)
         queue = self.get_queue(guild_id)
 
         if not voice_client:
             return
 
-        song = queue.get_next()
-        if not song:
-            return
+        for _ in range(MAX_SKIPPED_SONGS):
+            song = queue.get_next()
+            if not song:
+                return
 
-        try:
-            ## ffmpeg source
-            source = discord.FFmpegPCMAudio(song.url, **ffmpeg_options)
+            self.resume_attempts.pop(guild_id, None)
+            if await self.start_playback(guild_id, song):
+                return
 
-            ## set volume
-            volume = self.volumes.get(guild_id, 0.5)
-            source = discord.PCMVolumeTransformer(source, volume=volume)
+            if queue.loop_mode == 'single':
+                ## get_next would hand back the same song straight away
+                await self.notify(guild_id, f"❌ Could not play {song.title}, stopped looping it")
+                return
+
+        logger.warning("%d songs in a row failed to play, stopping", MAX_SKIPPED_SONGS, extra={'guild': guild_id})
+        await self.notify(guild_id, f"❌ {MAX_SKIPPED_SONGS} songs in a row couldn't be played, use !skip to carry on")
+
+    async def start_playback(self, guild_id, song, start=0, direct=False):
+        """Start (or restart) a song, optionally from an offset in seconds.
+        `direct` hands ffmpeg the stream url instead of going through the prebuffer."""
+        voice_client = self.get_voice_client(guild_id)
+        if not voice_client:
+            return False
+
+        ## stream urls expire, long queues extract them again when it's their turn;
+        ## ExtractionError goes up to the caller, an outage isn't a reason to skip the song
+        if not song.url and not await self.refresh_stream_url(song, guild_id):
+            logger.error("Track is no longer available: %s", song, extra={'guild': guild_id})
+            return False
+
+        ## the new source gets its ffmpeg slot before the old one is stopped, so a request
+        ## shed with SchedulerBusy leaves whatever is playing alone
+        tracker = None
+        try:
+            if self.broadcasts:
+                ## shared Opus encode, so per-guild volume and effects don't apply
+                tracker = source = await self.broadcasts.subscribe(
+                    song, start, self.build_ffmpeg_options(song, start), guild_id
+                )
+            else:
+                ## one slot per live ffmpeg process, raises SchedulerBusy when overloaded
+                await self.ffmpeg.acquire(guild_id, timeout=config.FFMPEG_WAIT)
+                prebuffer = self.open_prebuffer(song) if not start and not direct else None
+                try:
+                    if prebuffer:
+                        ## ffmpeg reads the prebuffer through its stdin
+                        source = discord.FFmpegPCMAudio(
+                            prebuffer, pipe=True, **self.build_ffmpeg_options(song, piped=True)
+                        )
+                    else:
+                        ## seeking reuses the cached stream url directly, ffmpeg jumps there itself
+                        source = discord.FFmpegPCMAudio(song.url, **self.build_ffmpeg_options(song, start))
+                except Exception:
+                    self.ffmpeg.release(guild_id)
+                    if prebuffer:
+                        prebuffer.close()
+                    raise
+
+                def on_cleanup():
+                    self.release_ffmpeg_slot(guild_id)
+                    if prebuffer:
+                        prebuffer.close()
+
+                tracker = TrackedAudio(source, start, on_cleanup=on_cleanup)
+                if prebuffer:
+                    self.prebuffers[guild_id] = prebuffer
+                else:
+                    self.prebuffers.pop(guild_id, None)
+
+                ## set volume and effects
+                volume = self.volumes.get(guild_id, 0.5)
+                if EffectsChain:
+                    source = EffectsChain(tracker, self.get_effects(guild_id), volume=volume)
+                else:
+                    source = discord.PCMVolumeTransformer(tracker, volume=volume)
+
+            ## callbacks from whatever was playing before are stale from here on; requests for
+            ## the same guild are granted slots in order, so the latest one ends up playing
+            generation = self.generations.get(guild_id, 0) + 1
+            self.generations[guild_id] = generation
+            if voice_client.is_playing() or voice_client.is_paused():
+                voice_client.stop()
+            self.trackers[guild_id] = tracker
 
             ## play and callback for next
             voice_client.play(
                 source,
                 after=lambda e: asyncio.run_coroutine_threadsafe(
-                    self.play_next(guild_id), self.bot.loop
-                ) if not e else logger.error(f"Player error: {e}")
+                    self.on_track_end(guild_id, generation, e), self.bot.loop
+                )
             )
 
-            logger.info(f"Now playing: {song}")
+            logger.info("Now playing: %s from %s", song, format_timestamp(start), extra={
+                'event': 'now_playing',
+                'guild': guild_id,
+                'song_source': song.source,
+            })
+            return True
 
+        except SchedulerBusy:
+            raise
+        except Exception as e:
+            logger.error("Error playing song: %s", e, extra={'guild': guild_id})
+            if tracker:
+                tracker.cleanup()
+            return False
+
+    async def refresh_stream_url(self, song, guild_id):
+        """Extract a fresh stream url for a song whose cached one expired.
+        False if the track itself is gone, ExtractionError if extraction is failing."""
+        try:
+            fresh = await self.extract_info(song.track_id, search=False, guild_id=guild_id, raise_errors=True)
+        except SchedulerBusy:
+            raise
         except Exception as e:
-            logger.error(f"Error playing song: {e}")
+            if is_unavailable(e):
+                return False
+            raise ExtractionError(str(e)) from e
+
+        if not fresh or not fresh.url:
+            return False
+        song.url = fresh.url
+        song.protocol = fresh.protocol
+        ## queued after its url had expired, so it was never measured
+        self.loudness.schedule(song)
+        return True
+
+    def open_prebuffer(self, song):
+        """Start fetching a song ahead of playback, None when prebuffering is off"""
+        if not config.PREBUFFER or not self.http:
+            return None
+        ## only plain media files; ffmpeg has to fetch HLS/DASH segments itself
+        if song.protocol not in PREBUFFER_PROTOCOLS:
+            return None
+        prebuffer = StreamPrebuffer(
+            self.http,
+            song.url,
+            song.duration,
+            ahead_seconds=config.PREBUFFER_SECONDS,
+            memory_limit=config.PREBUFFER_MEMORY,
+            chunk_size=config.PREBUFFER_CHUNK
+        )
+        prebuffer.start()
+        return prebuffer
+
+    def release_ffmpeg_slot(self, guild_id):
+        """Sources are cleaned up on the player thread, hand the release to the loop"""
+        try:
+            self.bot.loop.call_soon_threadsafe(self.ffmpeg.release, guild_id)
+        except RuntimeError:
+            pass  ## loop already closed
+
+    async def on_track_end(self, guild_id, generation, error):
+        """Player callback, resumes tracks that died early and otherwise moves on"""
+        if self.generations.get(guild_id) != generation:
+            return  ## replaced by a seek or resume
+
+        if error:
+            logger.error("Player error: %s", error, extra={'guild': guild_id})
+
+        tracker = self.trackers.pop(guild_id, None)
+        song = self.get_queue(guild_id).current
+
+        ## if the prebuffer couldn't fetch it, let ffmpeg read the url itself on resume
+        prebuffer = self.prebuffers.pop(guild_id, None)
+        direct = bool(prebuffer and prebuffer.error)
+        if direct:
+            logger.warning("Prebuffer gave up after %d retries, falling back to direct input: %s",
+                           prebuffer.retries, prebuffer.error, extra={'event': 'prebuffer', 'guild': guild_id})
+
+        start = 0
+        try:
+            ## a decoder that hits EOF well before the end means the stream dropped
+            if tracker and song and song.duration and (error or tracker.ended):
+                if tracker.position < song.duration - RESUME_TOLERANCE:
+                    attempts = self.resume_attempts.get(guild_id, 0)
+                    if attempts < MAX_RESUME_ATTEMPTS:
+                        self.resume_attempts[guild_id] = attempts + 1
+                        logger.warning("Stream ended early at %s, resuming", format_timestamp(tracker.position),
+                                       extra={'event': 'resume', 'guild': guild_id})
+                        start = tracker.position
+                        if await self.start_playback(guild_id, song, start, direct=direct):
+                            return
+                        start = 0
+
             await self.play_next(guild_id)
+        except (SchedulerBusy, ExtractionError) as e:
+            ## the queue's current song is the one that failed, start it again once things recover
+            if guild_id not in self.busy_retries:
+                self.busy_retries[guild_id] = asyncio.ensure_future(
+                    self.retry_track_change(guild_id, generation, start, e)
+                )
+        except Exception:
+            ## this runs as a future nobody waits on, make sure it doesn't fail silently
+            logger.exception("Error moving to the next track", extra={'guild': guild_id})
+
+    async def retry_track_change(self, guild_id, generation, start, error):
+        """A track change was shed for load or hit an extraction outage, keep trying with backoff"""
+        if isinstance(error, SchedulerBusy):
+            logger.warning("No %s slot free, retrying the track change", error.name, extra={'event': 'shed', 'guild': guild_id})
+            await self.notify(guild_id, "⏳ The bot is busy right now, the queue will carry on as soon as there's room")
+        else:
+            logger.warning("Extraction failed, retrying the track change: %s", error, extra={'guild': guild_id})
+            await self.notify(guild_id, "⚠️ Couldn't reach the music source, the queue will carry on once it's back")
+        try:
+            for delay in BUSY_RETRY_DELAYS:
+                await asyncio.sleep(delay)
+
+                ## a command started something else meanwhile, or the queue was stopped
+                song = self.get_queue(guild_id).current
+                if self.generations.get(guild_id) != generation or not song or not self.get_voice_client(guild_id):
+                    return
+
+                try:
+                    if not await self.start_playback(guild_id, song, start):
+                        await self.play_next(guild_id)
+                    return
+                except (SchedulerBusy, ExtractionError):
+                    if self.get_queue(guild_id).current is not song:
+                        start = 0  ## play_next moved on before failing too
+
+            logger.warning("Track change still failing, playback stopped", extra={'guild': guild_id})
+            await self.notify(guild_id, "❌ Playback couldn't recover, use !play or !skip to try again")
+        finally:
+            self.busy_retries.pop(guild_id, None)
+
+    async def notify(self, guild_id, message):
+        """Post to the channel the guild last used a command in"""
+        channel = self.text_channels.get(guild_id)
+        if not channel:
+            return
+        try:
+            await channel.send(message)
+        except discord.HTTPException:
+            pass
+
+    def get_position(self, guild_id):
+        tracker = self.trackers.get(guild_id)
+        return tracker.position if tracker else 0
+
+    async def seek(self, guild_id, position):
+        song = self.get_queue(guild_id).current
+        if not song:
+            return False
+        return await self.start_playback(guild_id, song, position)
+
+    async def resume_after_reconnect(self, guild_id):
+        """Restart the current song where it was after the voice connection moved"""
+        voice_client = self.get_voice_client(guild_id)
+        song = self.get_queue(guild_id).current
+        if not voice_client or not song or guild_id not in self.trackers:
+            return
+
+        for _ in range(20):
+            if voice_client.is_connected():
+                break
+            await asyncio.sleep(0.5)
+        else:
+            return
+
+        paused = voice_client.is_paused()
+        position = self.get_position(guild_id)
+        try:
+            resumed = await self.start_playback(guild_id, song, position)
+        except SchedulerBusy:
+            logger.warning("No ffmpeg slot free, could not resume", extra={'event': 'shed', 'guild': guild_id})
+            return
+        except ExtractionError as e:
+            logger.warning("Could not resume after reconnect: %s", e, extra={'guild': guild_id})
+            return
+        if resumed:
+            logger.info("Resumed %s at %s after reconnect", song, format_timestamp(position),
+                        extra={'event': 'resume', 'guild': guild_id})
+            if paused:
+                self.pause(guild_id)
+
+    def pause(self, guild_id):
+        voice_client = self.get_voice_client(guild_id)
+        if not voice_client or not voice_client.is_playing():
+            return False
+        voice_client.pause()
+
+        ## a paused guild would keep a shared encode running and later fall out of its
+        ## buffer, let go of it and start again from the same position on resume
+        tracker = self.trackers.get(guild_id)
+        if isinstance(tracker, BroadcastSubscriber):
+            tracker.cleanup()
+        return True
+
+    async def resume(self, guild_id):
+        voice_client = self.get_voice_client(guild_id)
+        if not voice_client or not voice_client.is_paused():
+            return False
+
+        tracker = self.trackers.get(guild_id)
+        song = self.get_queue(guild_id).current
+        if isinstance(tracker, BroadcastSubscriber) and tracker.closed and song:
+            return await self.start_playback(guild_id, song, tracker.position)
+        voice_client.resume()
+        return True
 
 class MusicView(discord.ui.View):
     """UI View with music control buttons"""
@@ -253,29 +1149,41 @@ class MusicView(discord.ui.View):
 
     @discord.ui.button(emoji='⏯️', style=discord.ButtonStyle.primary, row=0)
     async def play_pause(self, interaction: discord.Interaction, button: discord.ui.Button):
-        voice_client = self.player.get_voice_client(self.guild_id)
-        if voice_client:
-            if voice_client.is_playing():
-                voice_client.pause()
-                await interaction.response.send_message("⏸️ Paused", ephemeral=True)
-            elif voice_client.is_paused():
-                voice_client.resume()
-                await interaction.response.send_message("▶️ Resumed", ephemeral=True)
+        if self.player.pause(self.guild_id):
+            await interaction.response.send_message("⏸️ Paused", ephemeral=True)
+            return
+
+        try:
+            resumed = await self.player.resume(self.guild_id)
+        except SchedulerBusy:
+            await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+            return
+        except ExtractionError:
+            await interaction.response.send_message(EXTRACTION_FAILED_MESSAGE, ephemeral=True)
+            return
+        if resumed:
+            await interaction.response.send_message("▶️ Resumed", ephemeral=True)
 
     @discord.ui.button(emoji='⏮️', style=discord.ButtonStyle.secondary, row=0)
     async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
         queue = self.player.get_queue(self.guild_id)
-        voice_client = self.player.get_voice_client(self.guild_id)
+        if not queue.history:
+            return await interaction.response.send_message("No previous song", ephemeral=True)
 
-        if voice_client and voice_client.is_playing():
-            voice_client.stop()
-
-        prev_song = queue.get_previous()
-        if prev_song:
-            await self.player.play_next(self.guild_id)
-            await interaction.response.send_message(f"⏮️ Playing previous: {prev_song.title}", ephemeral=True)
-        else:
-            await interaction.response.send_message("No previous song", ephemeral=True)
+        ## start_playback replaces the current song itself, the queue only moves back once it has
+        prev_song = queue.history[-1]
+        try:
+            started = await self.player.start_playback(self.guild_id, prev_song)
+        except SchedulerBusy:
+            return await interaction.response.send_message(BUSY_MESSAGE, ephemeral=True)
+        except ExtractionError:
+            return await interaction.response.send_message(EXTRACTION_FAILED_MESSAGE, ephemeral=True)
+        if not started:
+            return await interaction.response.send_message("❌ Could not play the previous song", ephemeral=True)
+
+        if queue.history and queue.history[-1] is prev_song:
+            queue.get_previous()
+        await interaction.response.send_message(f"⏮️ Playing previous: {prev_song.title}", ephemeral=True)
 
     @discord.ui.button(emoji='⏭️', style=discord.ButtonStyle.secondary, row=0)
     async def skip(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -359,16 +1267,54 @@ class MusicBot(commands.Bot):
         )
 
         self.player = MusicPlayer(self)
+        self.watchdog = LoopWatchdog(config.WATCHDOG_INTERVAL, config.STALL_THRESHOLD)
+        self.profiler = SamplingProfiler(config.PROFILE_DIR, config.PROFILE_INTERVAL)
+
+    async def setup_hook(self):
+        self.watchdog.start()
+        self.player.http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=config.HTTP_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=15)
+        )
+
+        ## `kill -USR1 <pid>` profiles the running bot
+        if hasattr(signal, 'SIGUSR1'):
+            self.loop.add_signal_handler(
+                signal.SIGUSR1,
+                lambda: asyncio.ensure_future(self.run_profile(config.PROFILE_SECONDS))
+            )
+
+    async def run_profile(self, seconds):
+        """Sample every thread for a while and write a folded-stack file"""
+        logger.info("Profiling for %ds", seconds, extra={'event': 'profile'})
+        result = await asyncio.to_thread(self.profiler.run, seconds)
+        if result:
+            logger.info("Wrote %d profile samples to %s", result[1], result[0], extra={'event': 'profile'})
+        return result
+
+    async def close(self):
+        self.watchdog.stop()
+        self.player.loudness.shutdown()
+        await super().close()
+        if self.player.http:
+            await self.player.http.close()
+
+    async def on_voice_state_update(self, member, before, after):
+        ## moved or reconnected to another channel, pick the song up where it was
+        if member.id != self.user.id or not before.channel or not after.channel:
+            return
+        if before.channel != after.channel:
+            await self.player.resume_after_reconnect(member.guild.id)
 
     async def on_ready(self):
-        logger.info(f'{self.user} has connected to Discord!')
+        logger.info('%s has connected to Discord!', self.user)
 
     ## sync slash commands
         try:
             synced = await self.tree.sync()
-            logger.info(f"Synced {len(synced)} command(s)")
+            logger.info("Synced %d command(s)", len(synced))
         except Exception as e:
-            logger.error(f"Failed to sync commands: {e}")
+            logger.error("Failed to sync commands: %s", e)
 
 ## bot instance
 bot = MusicBot()
@@ -415,12 +1361,11 @@ async def play(ctx, *, query: str):
     async with ctx.typing():
     ## get song info
         if 'playlist' in query and 'spotify' in query:
-            songs = await bot.player.extract_info(query, search=False)
+            songs = await bot.player.extract_info(query, search=False, guild_id=ctx.guild.id)
             if songs:
-                queue = bot.player.get_queue(ctx.guild.id)
                 for song in songs:
-                    song.requester = ctx.author
-                    queue.add(song)
+                    song.requester_id = ctx.author.id
+                    bot.player.enqueue(ctx.guild.id, song)
 
                 embed = discord.Embed(
                     title="Playlist Added to Queue",
@@ -432,11 +1377,10 @@ async def play(ctx, *, query: str):
             else:
                 await ctx.send("❌ Could not process playlist")
         else:
-            song = await bot.player.extract_info(query)
+            song = await bot.player.extract_info(query, guild_id=ctx.guild.id)
             if song:
-                song.requester = ctx.author
-                queue = bot.player.get_queue(ctx.guild.id)
-                queue.add(song)
+                song.requester_id = ctx.author.id
+                bot.player.enqueue(ctx.guild.id, song)
 
                 embed = discord.Embed(
                     title="Added to Queue",
@@ -462,9 +1406,7 @@ async def play(ctx, *, query: str):
 @bot.hybrid_command(name='pause', description='Pause the current song')
 async def pause(ctx):
     """Pause the current song"""
-    voice_client = bot.player.get_voice_client(ctx.guild.id)
-    if voice_client and voice_client.is_playing():
-        voice_client.pause()
+    if bot.player.pause(ctx.guild.id):
         await ctx.send("⏸️ Paused")
     else:
         await ctx.send("❌ Nothing is playing")
@@ -472,9 +1414,7 @@ async def pause(ctx):
 @bot.hybrid_command(name='resume', description='Resume the current song')
 async def resume(ctx):
     """Resume the current song"""
-    voice_client = bot.player.get_voice_client(ctx.guild.id)
-    if voice_client and voice_client.is_paused():
-        voice_client.resume()
+    if await bot.player.resume(ctx.guild.id):
         await ctx.send("▶️ Resumed")
     else:
         await ctx.send("❌ Nothing is paused")
@@ -486,6 +1426,10 @@ async def skip(ctx):
     if voice_client and voice_client.is_playing():
         voice_client.stop()
         await ctx.send("⏭️ Skipped")
+    elif voice_client and bot.player.get_queue(ctx.guild.id).queue:
+        ## the queue stopped on songs that couldn't be played, carry on with the next one
+        await ctx.send("⏭️ Skipped")
+        await bot.player.play_next(ctx.guild.id)
     else:
         await ctx.send("❌ Nothing is playing")
 
@@ -564,11 +1508,13 @@ async def nowplaying(ctx):
     )
 
     embed.add_field(name="Source", value=song.source, inline=True)
-    embed.add_field(name="Requested by", value=song.requester.mention if song.requester else "Unknown", inline=True)
+    embed.add_field(name="Requested by", value=f"<@{song.requester_id}>" if song.requester_id else "Unknown", inline=True)
 
+    position = format_timestamp(bot.player.get_position(ctx.guild.id))
     if song.duration:
-        duration_str = f"{song.duration // 60}:{song.duration % 60:02d}"
-        embed.add_field(name="Duration", value=duration_str, inline=True)
+        embed.add_field(name="Position", value=f"{position} / {format_timestamp(song.duration)}", inline=True)
+    else:
+        embed.add_field(name="Position", value=position, inline=True)
 
     if song.thumbnail:
         embed.set_thumbnail(url=song.thumbnail)
@@ -579,9 +1525,32 @@ async def nowplaying(ctx):
     view = MusicView(bot.player, ctx.guild.id)
     await ctx.send(embed=embed, view=view)
 
+@bot.hybrid_command(name='seek', description='Jump to a position in the current song')
+async def seek(ctx, position: str):
+    """Jump to a position in the current song"""
+    queue = bot.player.get_queue(ctx.guild.id)
+    if not queue.current or not bot.player.get_voice_client(ctx.guild.id):
+        return await ctx.send("❌ Nothing is playing")
+
+    seconds = parse_timestamp(position)
+    if seconds is None:
+        return await ctx.send("❌ Position must look like 90, 1:30 or 1:02:30")
+    if queue.current.duration and seconds >= queue.current.duration:
+        return await ctx.send(f"❌ Song is only {format_timestamp(queue.current.duration)} long")
+
+    if await bot.player.seek(ctx.guild.id, seconds):
+        await ctx.send(f"⏩ Seeked to {format_timestamp(seconds)}")
+    else:
+        await ctx.send("❌ Could not seek")
+
+## shared streams are encoded once for every server, so nothing per server applies
+BROADCAST_NO_EFFECTS = "❌ Per-server volume and effects aren't available in broadcast mode"
+
 @bot.hybrid_command(name='volume', description='Set the volume (0-100)')
 async def volume(ctx, volume: int):
     """Set the volume"""
+    if bot.player.broadcasts:
+        return await ctx.send(BROADCAST_NO_EFFECTS)
     if not 0 <= volume <= 100:
         return await ctx.send("❌ Volume must be between 0 and 100")
 
@@ -594,6 +1563,65 @@ async def volume(ctx, volume: int):
 
     await ctx.send(f"🔊 Volume set to {volume}%")
 
+async def effects_unavailable(ctx):
+    if bot.player.broadcasts:
+        await ctx.send(BROADCAST_NO_EFFECTS)
+        return True
+    if EffectsChain:
+        return False
+    await ctx.send("❌ Audio effects need numpy installed")
+    return True
+
+@bot.hybrid_command(name='bassboost', description='Boost the bass (0-20 dB, 0 turns it off)')
+async def bassboost(ctx, gain: int = 6):
+    """Boost the bass"""
+    if await effects_unavailable(ctx):
+        return
+    if not 0 <= gain <= 20:
+        return await ctx.send("❌ Bass boost must be between 0 and 20 dB")
+
+    bot.player.get_effects(ctx.guild.id).bass = gain
+    bot.player.apply_effects(ctx.guild.id)
+    await ctx.send(f"🔈 Bass boost {'set to ' + str(gain) + ' dB' if gain else 'disabled'}")
+
+@bot.hybrid_command(name='nightcore', description='Toggle nightcore mode')
+async def nightcore(ctx):
+    """Toggle nightcore mode"""
+    if await effects_unavailable(ctx):
+        return
+
+    settings = bot.player.get_effects(ctx.guild.id)
+    settings.speed = 1.0 if settings.speed != 1.0 else 1.25
+    bot.player.apply_effects(ctx.guild.id)
+    status = "enabled" if settings.speed != 1.0 else "disabled"
+    await ctx.send(f"🌙 Nightcore {status}")
+
+@bot.hybrid_command(name='eq', description='Set the equalizer in dB (-12 to 12)')
+async def eq(ctx, bass: int, mid: int = 0, treble: int = 0):
+    """Set the equalizer"""
+    if await effects_unavailable(ctx):
+        return
+    if not all(-12 <= gain <= 12 for gain in (bass, mid, treble)):
+        return await ctx.send("❌ EQ gains must be between -12 and 12 dB")
+
+    settings = bot.player.get_effects(ctx.guild.id)
+    settings.bass, settings.mid, settings.treble = bass, mid, treble
+    bot.player.apply_effects(ctx.guild.id)
+    await ctx.send(f"🎚️ EQ set to bass {bass:+d} dB, mid {mid:+d} dB, treble {treble:+d} dB")
+
+@bot.hybrid_command(name='effects', description='Show or reset audio effects')
+async def effects(ctx, action: str = None):
+    """Show or reset audio effects"""
+    if await effects_unavailable(ctx):
+        return
+
+    if action and action.lower() == 'reset':
+        bot.player.effects[ctx.guild.id] = EffectSettings()
+        bot.player.apply_effects(ctx.guild.id)
+        return await ctx.send("🎛️ Effects reset")
+
+    await ctx.send(f"🎛️ {bot.player.get_effects(ctx.guild.id)}")
+
 @bot.hybrid_command(name='clear', description='Clear the queue')
 async def clear_queue(ctx):
     """Clear the queue"""
@@ -647,17 +1675,106 @@ async def remove(ctx, position: int):
     queue.queue = new_queue
     await ctx.send(f"🗑️ Removed **{removed_song.title}** from queue")
 
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+    if ctx.guild:
+        bot.player.text_channels[ctx.guild.id] = ctx.channel
+
+@bot.event
+async def on_command_completion(ctx):
+    started = getattr(ctx, 'started_at', None)
+    logger.info("Command %s completed", ctx.command.qualified_name, extra={
+        'event': 'command',
+        'guild': ctx.guild.id if ctx.guild else None,
+        'command': ctx.command.qualified_name,
+        'latency_ms': round((time.perf_counter() - started) * 1000) if started else None,
+    })
+
+@bot.hybrid_command(name='scheduler', description='Show extraction and ffmpeg load')
+async def scheduler(ctx):
+    """Show extraction and ffmpeg load"""
+    embed = discord.Embed(title="Scheduler", color=0x7289da)
+    for pool in (bot.player.extractions, bot.player.ffmpeg):
+        embed.add_field(name=pool.name.capitalize(), value=pool.describe(), inline=False)
+
+    if bot.player.broadcasts:
+        embed.add_field(name="Broadcast", value=bot.player.broadcasts.describe(), inline=False)
+
+    guild_id = ctx.guild.id
+    embed.add_field(
+        name="This server",
+        value=f"Extractions: {bot.player.extractions.active_by_guild.get(guild_id, 0)} | "
+              f"ffmpeg: {bot.player.ffmpeg.active_by_guild.get(guild_id, 0)}",
+        inline=False
+    )
+    await ctx.send(embed=embed)
+
+@bot.hybrid_command(name='buffer', description='Show read-ahead buffer health')
+async def buffer(ctx):
+    """Show read-ahead buffer health"""
+    if not config.PREBUFFER:
+        return await ctx.send("❌ Prebuffering is disabled")
+
+    prebuffer = bot.player.prebuffers.get(ctx.guild.id)
+    if not prebuffer or prebuffer.closed:
+        return await ctx.send("❌ Nothing is streaming through the prebuffer right now")
+
+    status = "complete" if prebuffer.eof and not prebuffer.error else "failed" if prebuffer.error else "fetching"
+    await ctx.send(f"📶 Buffer ({status}): {prebuffer.describe()}")
+
+@bot.hybrid_command(name='profile', description='Profile the bot and write a flamegraph file (owner only)')
+@commands.is_owner()
+async def profile(ctx, seconds: int = 10):
+    """Profile the bot and write a flamegraph file"""
+    if not 1 <= seconds <= 120:
+        return await ctx.send("❌ Profile length must be between 1 and 120 seconds")
+
+    await ctx.send(f"🔬 Profiling for {seconds}s...")
+    result = await bot.run_profile(seconds)
+    if not result:
+        return await ctx.send("❌ A profile is already running")
+
+    path, samples = result
+    watchdog = bot.watchdog
+    await ctx.send(
+        f"📄 Wrote {samples} samples to `{path}`\n"
+        f"Loop lag: {watchdog.lag * 1000:.0f} ms (max {watchdog.max_lag * 1000:.0f} ms) | "
+        f"Stalls: {watchdog.stalls}"
+    )
+
 # Error handling
 @bot.event
 async def on_command_error(ctx, error):
+    ## load shedding surfaces wrapped in CommandInvokeError / HybridCommandError
+    cause = error
+    while hasattr(cause, 'original'):
+        cause = cause.original
+
     if isinstance(error, commands.CommandNotFound):
         return
+    elif isinstance(cause, SchedulerBusy):
+        logger.info("Shed %s request", cause.name, extra={
+            'event': 'shed',
+            'guild': ctx.guild.id if ctx.guild else None,
+            'command': ctx.command.qualified_name if ctx.command else None,
+        })
+        await ctx.send(BUSY_MESSAGE)
+    elif isinstance(cause, ExtractionError):
+        logger.warning("Extraction failed: %s", cause, extra={'guild': ctx.guild.id if ctx.guild else None})
+        await ctx.send(EXTRACTION_FAILED_MESSAGE)
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"❌ Missing required argument: {error.param}")
     elif isinstance(error, commands.BadArgument):
         await ctx.send(f"❌ Invalid argument: {error}")
+    elif isinstance(error, commands.NotOwner):
+        await ctx.send("❌ Only the bot owner can use this command")
     else:
-        logger.error(f"Unexpected error: {error}")
+        logger.error("Unexpected error: %s", error, extra={
+            'event': 'command_error',
+            'guild': ctx.guild.id if ctx.guild else None,
+            'command': ctx.command.qualified_name if ctx.command else None,
+        })
         await ctx.send("❌ An unexpected error occurred")
 
 # Run the bot
@@ -676,16 +1793,21 @@ if __name__ == "__main__":
     print("  !play <query> - Play a song")
     print("  !pause/!resume - Control playback")
     print("  !skip - Skip current song")
+    print("  !seek <position> - Jump to a position")
     print("  !stop - Stop and clear queue")
     print("  !queue - Show queue")
     print("  !volume <0-100> - Set volume")
+    print("  !bassboost/!nightcore/!eq/!effects - Audio effects")
     print("  !shuffle - Toggle shuffle")
     print("  !loop [off/single/queue] - Set loop mode")
     print("  !clear - Clear queue")
     print("  !remove <position> - Remove song from queue")
+    print("  !scheduler - Show extraction and ffmpeg load")
+    print("  !buffer - Show read-ahead buffer health")
     print("\n🚀 Bot is ready! Use the commands in Discord.")
 
     try:
-        bot.run(config.DISCORD_TOKEN)
+        ## logging is already routed through the queue, so no extra handler from discord.py
+        bot.run(config.DISCORD_TOKEN, log_handler=None)
     except Exception as e:
-        logger.error(f"Failed to start bot: {e}")
+        logger.error("Failed to start bot: %s", e)
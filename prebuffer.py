@@ -0,0 +1,265 @@
+"""
+Read-ahead prebuffer between remote stream urls and ffmpeg.
+
+The stream is fetched with HTTP range requests over the bot's pooled aiohttp
+session and kept a few seconds ahead of playback. ffmpeg reads it from stdin
+(discord.py's pipe mode), so network jitter and throttled responses are
+absorbed by the buffer instead of being heard. Memory per stream is bounded;
+anything past the limit spills to a temp file.
+"""
+
+import asyncio
+import re
+import tempfile
+import threading
+from collections import deque
+
+import aiohttp
+
+CHUNK_SIZE = 256 * 1024
+READ_SIZE = 64 * 1024
+DEFAULT_BITRATE = 160_000  ## bits/s, typical YouTube audio, until the real size is known
+MAX_RETRIES = 5
+RETRY_STATUSES = (408, 429)  ## the only 4xx responses worth retrying
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+PREBUFFER_PROTOCOLS = ('http', 'https')  ## yt-dlp protocols of single files that can be range-fetched
+
+class SpillBuffer:
+    """FIFO of bytes held in memory up to `memory_limit`, the rest in a temp file.
+
+    Not thread-safe on its own, StreamPrebuffer guards it with its condition.
+    """
+
+    def __init__(self, memory_limit):
+        self.memory_limit = memory_limit
+        self.chunks = deque()
+        self.head_offset = 0  ## bytes already read from chunks[0]
+        self.memory_bytes = 0
+        self.file = None
+        self.file_read = 0
+        self.file_write = 0
+        self.spilled = 0
+
+    def __len__(self):
+        return self.memory_bytes + self.file_write - self.file_read
+
+    def will_spill(self, size):
+        ## once spilling, everything goes to the file until it drains, to keep order
+        return self.file_write > self.file_read or self.memory_bytes + size > self.memory_limit
+
+    def write(self, data):
+        if not self.will_spill(len(data)):
+            self.chunks.append(data)
+            self.memory_bytes += len(data)
+            return
+
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        self.file.seek(self.file_write)
+        self.file.write(data)
+        self.file_write += len(data)
+        self.spilled += len(data)
+
+    def read(self, size):
+        if self.chunks:
+            chunk = self.chunks[0]
+            data = chunk[self.head_offset:self.head_offset + size]
+            self.head_offset += len(data)
+            if self.head_offset >= len(chunk):
+                self.chunks.popleft()
+                self.head_offset = 0
+            self.memory_bytes -= len(data)
+            return data
+
+        if self.file_write > self.file_read:
+            self.file.seek(self.file_read)
+            data = self.file.read(min(size, self.file_write - self.file_read))
+            self.file_read += len(data)
+            if self.file_read == self.file_write:
+                ## drained, start the file over instead of letting it grow
+                self.file.seek(0)
+                self.file.truncate()
+                self.file_read = self.file_write = 0
+            return data
+
+        return b''
+
+    def close(self):
+        self.chunks.clear()
+        self.memory_bytes = 0
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class StreamPrebuffer:
+    """Fetches a stream ahead of playback and hands it to ffmpeg as a file-like object"""
+
+    def __init__(self, session, url, duration=0, ahead_seconds=10, memory_limit=4 * 1024 * 1024,
+                 chunk_size=CHUNK_SIZE):
+        self.session = session
+        self.url = url
+        self.duration = duration
+        self.ahead_seconds = ahead_seconds
+        self.chunk_size = chunk_size
+        self.buffer = SpillBuffer(memory_limit)
+        self.cond = threading.Condition()
+        self.loop = None
+        self.task = None
+        self.wakeup = None
+
+        self.offset = 0  ## next byte to fetch
+        self.consumed = 0  ## bytes handed to ffmpeg
+        self.total = None
+        self.eof = False
+        self.closed = False
+        self.error = None
+
+        ## buffer health
+        self.requests = 0
+        self.retries = 0
+        self.underruns = 0
+
+    @property
+    def byte_rate(self):
+        if self.total and self.duration:
+            return self.total / self.duration
+        return DEFAULT_BITRATE / 8
+
+    @property
+    def seconds_ahead(self):
+        return len(self.buffer) / self.byte_rate
+
+    def start(self):
+        """Call from the event loop"""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.ensure_future(self.fetch())
+
+    async def fetch(self):
+        try:
+            while not self.closed and not self.eof:
+                await self.wait_for_reader()
+                if not self.closed:
+                    await self.fetch_range()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            ## ffmpeg sees a short stream and the player resumes it from its position
+            self.error = e
+        finally:
+            with self.cond:
+                self.eof = True
+                self.cond.notify_all()
+
+    async def fetch_range(self):
+        for attempt in range(MAX_RETRIES + 1):
+            end = self.offset + self.chunk_size - 1
+            if self.total:
+                end = min(end, self.total - 1)
+
+            try:
+                async with self.session.get(self.url, headers={'Range': f'bytes={self.offset}-{end}'}) as response:
+                    self.requests += 1
+                    if response.status == 416:
+                        self.eof = True
+                        return
+                    response.raise_for_status()
+
+                    if response.status == 206:
+                        match = CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                        if match and match.group(3) != '*':
+                            self.total = int(match.group(3))
+                        skip = 0
+                    else:
+                        ## server ignored the range and sent everything, drop what we already have
+                        self.total = response.content_length
+                        skip = self.offset
+                        self.offset = 0
+
+                    async for data in response.content.iter_chunked(READ_SIZE):
+                        if self.closed:
+                            return
+                        if skip:
+                            dropped = min(skip, len(data))
+                            skip -= dropped
+                            self.offset += dropped
+                            data = data[dropped:]
+                            if not data:
+                                continue
+                        await self.push(data)
+
+                    if response.status != 206 or (self.total and self.offset >= self.total):
+                        self.eof = True
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                ## an expired or forbidden url won't get better, fail fast so the player falls back
+                permanent = (isinstance(e, aiohttp.ClientResponseError) and 400 <= e.status < 500
+                             and e.status not in RETRY_STATUSES)
+                if permanent or attempt == MAX_RETRIES:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(min(0.25 * 2 ** attempt, 5))
+
+    async def wait_for_reader(self):
+        """Backpressure between requests, so the pooled connection isn't held while ffmpeg catches up"""
+        while not self.closed and self.seconds_ahead >= self.ahead_seconds:
+            self.wakeup.clear()
+            await self.wakeup.wait()
+
+    async def push(self, data):
+        ## each range response is read to the end; a server that ignores ranges sends the
+        ## whole file in one go, which SpillBuffer moves to disk past the memory limit
+        if self.buffer.will_spill(len(data)):
+            await asyncio.to_thread(self.write, data)
+        else:
+            self.write(data)
+        self.offset += len(data)
+
+    def write(self, data):
+        with self.cond:
+            if self.closed:
+                return  ## a spill write that lost the race with close(), don't reopen the file
+            self.buffer.write(data)
+            self.cond.notify_all()
+
+    def read(self, size):
+        """Blocking read for discord.py's stdin writer thread, b'' at the end"""
+        with self.cond:
+            waited = False
+            while not len(self.buffer) and not self.eof and not self.closed:
+                if self.consumed and not waited:
+                    self.underruns += 1
+                waited = True
+                self.cond.wait(0.5)
+
+            if self.closed:
+                return b''
+            data = self.buffer.read(size)
+            self.consumed += len(data)
+
+        if self.seconds_ahead < self.ahead_seconds:
+            self.call_soon(self.wakeup.set)
+        return data
+
+    def call_soon(self, callback):
+        try:
+            self.loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  ## loop already closed
+
+    def close(self):
+        """Safe from any thread"""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.buffer.close()
+            self.cond.notify_all()
+        if self.task:
+            self.call_soon(self.task.cancel)
+            self.call_soon(self.wakeup.set)
+
+    def describe(self):
+        return (f"{self.seconds_ahead:.1f}s ahead ({len(self.buffer) / 1024:.0f} KiB, "
+                f"{self.buffer.spilled / 1024:.0f} KiB spilled) | {self.consumed / 1024:.0f} KiB played | "
+                f"underruns {self.underruns} | requests {self.requests}, retries {self.retries}")
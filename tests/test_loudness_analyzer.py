@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+## the bot module configures itself from the environment on import
+os.environ.setdefault('SPOTIFY_CLIENT_ID', 'test')
+os.environ.setdefault('SPOTIFY_CLIENT_SECRET', 'test')
+os.environ['LOUDNESS_DB'] = ':memory:'
+os.environ['LOG_FILE'] = ''
+
+import discord_music_bot as bot_module
+from tracks import Song
+
+class AnalysisSlotsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_queued_analyses_leave_ffmpeg_slots_for_playback(self):
+        release = asyncio.Event()
+
+        async def slow_measure(url, max_seconds=600):
+            await release.wait()
+            return -20.0, -6.0
+
+        ffmpeg = bot_module.FairScheduler('ffmpeg', 4, 200)
+        analyzer = bot_module.LoudnessAnalyzer(bot_module.LoudnessStore(':memory:'), -14, 2, ffmpeg)
+
+        with mock.patch.object(bot_module, 'measure_loudness', slow_measure):
+            for i in range(6):
+                analyzer.schedule(Song(f'Track {i}', 'Artist', f'https://example.com/{i}', 200, None))
+            await asyncio.sleep(0)
+
+            ## only as many slots as analysis workers, nothing queued in the scheduler
+            self.assertEqual(ffmpeg.active, 2)
+            self.assertEqual(ffmpeg.waiting_count, 0)
+
+            ## playback still gets the rest straight away
+            await ffmpeg.acquire(1, timeout=0.1)
+            await ffmpeg.acquire(2, timeout=0.1)
+            self.assertEqual(ffmpeg.active, 4)
+
+            ffmpeg.release(1)
+            ffmpeg.release(2)
+            release.set()
+            await asyncio.gather(*analyzer.pending.values())
+
+        self.assertEqual(ffmpeg.active, 0)
+        self.assertEqual(len(analyzer.store.gains), 6)
+        analyzer.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
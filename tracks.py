@@ -0,0 +1,130 @@
+"""
+Compact track records for queues and history.
+
+Queues can hold tens of thousands of songs across guilds, so Song is slotted,
+keeps the requester's ID instead of the Member, interns artist and source
+strings and leaves the long signed stream URL in a shared table that forgets
+it once it has expired.
+"""
+
+import re
+import sys
+import time
+
+STREAM_URL_TTL = 5 * 60 * 60  ## used when the url doesn't say when it expires
+EXPIRY_MARGIN = 60
+EXPIRE_PARAM = re.compile(r'[/?&]expire[=/](\d+)')
+
+class StreamUrlCache:
+    """track id -> stream url, expired urls are dropped.
+
+    googlevideo urls carry their own expiry, so for those only the url is
+    stored; a deadline is kept separately just for urls that don't say.
+    """
+
+    def __init__(self, default_ttl=STREAM_URL_TTL, sweep_every=1024):
+        self.entries = {}
+        self.deadlines = {}
+        self.default_ttl = default_ttl
+        self.sweep_every = sweep_every
+        self.writes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def expires_at(self, track_id, url):
+        match = EXPIRE_PARAM.search(url)
+        if match:
+            return int(match.group(1)) - EXPIRY_MARGIN
+        return self.deadlines.get(track_id, 0)
+
+    def get(self, track_id):
+        url = self.entries.get(track_id)
+        if url and self.expires_at(track_id, url) <= time.time():
+            self.discard(track_id)
+            return None
+        return url
+
+    def put(self, track_id, url):
+        if not url:
+            self.discard(track_id)
+            return
+
+        self.entries[track_id] = url
+        if EXPIRE_PARAM.search(url):
+            self.deadlines.pop(track_id, None)
+        else:
+            self.deadlines[track_id] = time.time() + self.default_ttl
+
+        self.writes += 1
+        if self.writes % self.sweep_every == 0:
+            self.sweep()
+
+    def discard(self, track_id):
+        self.entries.pop(track_id, None)
+        self.deadlines.pop(track_id, None)
+
+    def sweep(self):
+        now = time.time()
+        expired = [track_id for track_id, url in self.entries.items() if self.expires_at(track_id, url) <= now]
+        for track_id in expired:
+            self.discard(track_id)
+
+stream_urls = StreamUrlCache()
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Song:
+    __slots__ = ('title', '_artist', 'duration', 'thumbnail', '_source', 'requester_id', 'track_id', '_protocol')
+
+    def __init__(self, title, artist, url, duration, thumbnail, source='YouTube', requester_id=None, track_id=None,
+                 protocol=None):
+        self.title = title
+        self.artist = artist
+        self.duration = duration
+        self.thumbnail = thumbnail
+        self.source = source
+        self.requester_id = requester_id
+        ## stable id (webpage url), unlike the signed stream url; the url itself is the fallback key
+        self.track_id = track_id or url
+        self.url = url
+        ## yt-dlp's protocol for the stream url: 'https' for plain media, 'm3u8_native' etc. for manifests
+        self.protocol = protocol
+
+    @property
+    def artist(self):
+        return self._artist
+
+    @artist.setter
+    def artist(self, value):
+        self._artist = intern(value)
+
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, value):
+        self._source = intern(value)
+
+    @property
+    def protocol(self):
+        return self._protocol
+
+    @protocol.setter
+    def protocol(self, value):
+        self._protocol = intern(value)
+
+    @property
+    def url(self):
+        """Stream url, None once it has expired and needs extracting again"""
+        return stream_urls.get(self.track_id) if self.track_id else None
+
+    @url.setter
+    def url(self, value):
+        if self.track_id:
+            stream_urls.put(self.track_id, value)
+
+    def __str__(self):
+        return f"{self.title} by {self.artist} ({self.source})"